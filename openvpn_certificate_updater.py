@@ -10,23 +10,203 @@ Data: 2024
 
 import os
 import sys
+import json
+import mmap
 import yaml
 import ftplib
 import logging
+import logging.handlers
 import shutil
 import subprocess
 import time
 import socket
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, fields
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import hashlib
 
+# Parser YAML em C (libyaml) quando disponível
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+# BLAKE3 é opcional: bem mais rápido que MD5 para verificar equivalência de arquivos
+try:
+    from blake3 import blake3
+    HASH_ALGORITHM = 'blake3'
+except ImportError:
+    blake3 = None
+    HASH_ALGORITHM = 'md5'
+
+# systemd-python é opcional: permite ler o journal sem executar journalctl
+try:
+    from systemd import journal
+except ImportError:
+    journal = None
+
+# slots=True só é suportado em dataclasses a partir do Python 3.10
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
+class FtpCfg:
+    """
+    Configurações do servidor FTP
+    """
+    host: str
+    username: str
+    password: str
+    port: int = 21
+    use_passive: bool = True
+    tune_sockets: bool = True
+    
+    def __post_init__(self):
+        if not 1 <= self.port <= 65535:
+            raise ValueError(f"Configuração 'ftp.port' inválida: {self.port} (esperado 1-65535)")
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
+class OpenVpnCfg:
+    """
+    Configurações dos arquivos OpenVPN
+    """
+    remote_path: str
+    local_openvpn_path: str
+    local_config_filename: str
+    backup_path: Optional[str] = None
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
+class RollbackCfg:
+    """
+    Configurações de verificação de conectividade e rollback
+    """
+    check_connectivity: bool = True
+    max_connection_attempts: int = 3
+    retry_interval: int = 10
+    auto_rollback: bool = True
+    
+    def __post_init__(self):
+        if self.max_connection_attempts < 1:
+            raise ValueError(f"Configuração 'rollback.max_connection_attempts' inválida: "
+                             f"{self.max_connection_attempts} (esperado >= 1)")
+        if self.retry_interval < 0:
+            raise ValueError(f"Configuração 'rollback.retry_interval' inválida: "
+                             f"{self.retry_interval} (esperado >= 0)")
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
+class VerificationCfg:
+    """
+    Configurações de verificação e instalação
+    """
+    create_backup: bool = True
+    restart_openvpn: bool = True
+    openvpn_service_name: str = 'openvpn@client'
+    strict_hash_verify: bool = False
+
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
+class UpdaterCfg:
+    """
+    Configurações do updater já validadas
+    """
+    ftp: FtpCfg
+    openvpn: OpenVpnCfg
+    verification: VerificationCfg
+    rollback: RollbackCfg
+    
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> 'UpdaterCfg':
+        """
+        Constrói as configurações a partir do dicionário carregado do YAML
+        
+        Chaves desconhecidas são ignoradas. O tipo de cada valor é verificado
+        contra a anotação do campo e os limites numéricos em __post_init__.
+        
+        Args:
+            raw (Dict[str, Any]): Configurações carregadas do YAML
+            
+        Returns:
+            UpdaterCfg: Configurações tipadas
+            
+        Raises:
+            ValueError: Se algum valor tiver tipo ou faixa inválidos
+        """
+        def build(section_cls, section: Optional[Dict[str, Any]], name: str):
+            section = section or {}
+            values = {}
+            for f in fields(section_cls):
+                if f.name not in section:
+                    continue
+                value = section[f.name]
+                optional = f.type is Optional[str]
+                expected = str if optional else f.type
+                # bool é subclasse de int: não aceitar true/false onde se espera número
+                if not (optional and value is None) and (
+                        not isinstance(value, expected) or
+                        (isinstance(value, bool) and expected is not bool)):
+                    raise ValueError(f"Configuração '{name}.{f.name}' inválida: {value!r} "
+                                     f"(esperado {expected.__name__})")
+                values[f.name] = value
+            return section_cls(**values)
+        
+        verification = raw.get('verification') or {}
+        return cls(
+            ftp=build(FtpCfg, raw['ftp'], 'ftp'),
+            openvpn=build(OpenVpnCfg, raw['openvpn'], 'openvpn'),
+            verification=build(VerificationCfg, verification, 'verification'),
+            rollback=build(RollbackCfg, verification.get('rollback'), 'rollback')
+        )
+
+
+def _tune_socket(sock: socket.socket):
+    """
+    Desativa o algoritmo de Nagle e ativa keepalive TCP no socket
+    
+    Args:
+        sock (socket.socket): Socket a ser ajustado
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+
+class TunedFTP(ftplib.FTP):
+    """
+    Conexão FTP com TCP_NODELAY e SO_KEEPALIVE nos canais de controle e de dados
+    """
+    
+    def connect(self, *args, **kwargs):
+        """
+        Conecta ao servidor e ajusta o socket de controle
+        """
+        welcome = super().connect(*args, **kwargs)
+        _tune_socket(self.sock)
+        return welcome
+    
+    def ntransfercmd(self, cmd, rest=None):
+        """
+        Abre o canal de dados e ajusta o socket da transferência
+        """
+        conn, size = super().ntransfercmd(cmd, rest)
+        _tune_socket(conn)
+        return conn, size
+
+
 class OpenVPNConfigUpdater:
     """
     Classe principal para gerenciar a atualização de configurações OpenVPN
     """
     
+    # Marcadores de erro procurados nas mensagens do journal
+    _JOURNAL_ERROR_MARKERS = ('ERROR', 'FATAL')
+    
+    # Espera (segundos) para o OpenVPN estabilizar após o reinício
+    _SETTLE_DELAY = 5
+    
     def __init__(self, config_file: str = "config.yml"):
         """
         Inicializa o updater com arquivo de configuração
@@ -38,9 +218,25 @@ class OpenVPNConfigUpdater:
         self.config = self._load_config()
         self._setup_logging()
         
+        # Extensões do servidor FTP (preenchido na primeira consulta FEAT)
+        self._ftp_features = None
+        
+        # Diretório remoto atual da conexão FTP (evita CWD repetidos)
+        self._cwd = None
+        
+        # Estado da última verificação (carregado em check_and_update_config)
+        self._state = {}
+        
         # Validação de configurações
         self._validate_config()
         
+        self.cfg = UpdaterCfg.from_dict(self.config)
+        
+        # Caminhos derivados, calculados uma única vez
+        self._local_file_path = os.path.join(self.cfg.openvpn.local_openvpn_path,
+                                             self.cfg.openvpn.local_config_filename)
+        self._temp_file_path = f"{self._local_file_path}.new"
+        
         self.logger.info("OpenVPN Config Updater inicializado")
     
     def _load_config(self) -> Dict[str, Any]:
@@ -52,7 +248,7 @@ class OpenVPNConfigUpdater:
         """
         try:
             with open(self.config_file, 'r', encoding='utf-8') as file:
-                return yaml.safe_load(file)
+                return yaml.load(file, Loader=YamlLoader)
         except FileNotFoundError:
             raise FileNotFoundError(f"Arquivo de configuração não encontrado: {self.config_file}")
         except yaml.YAMLError as e:
@@ -68,7 +264,7 @@ class OpenVPNConfigUpdater:
         
         # Criar diretório de log se não existir
         log_dir = os.path.dirname(log_file)
-        if log_dir and not os.path.exists(log_dir):
+        if log_dir:
             os.makedirs(log_dir, exist_ok=True)
         
         # Configurar logging
@@ -76,7 +272,11 @@ class OpenVPNConfigUpdater:
             level=log_level,
             format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
             handlers=[
-                logging.FileHandler(log_file),
+                logging.handlers.RotatingFileHandler(
+                    log_file,
+                    maxBytes=log_config.get('max_bytes', 5 << 20),
+                    backupCount=log_config.get('backup_count', 5)
+                ),
                 logging.StreamHandler(sys.stdout)
             ]
         )
@@ -113,17 +313,20 @@ class OpenVPNConfigUpdater:
         Returns:
             ftplib.FTP: Conexão FTP estabelecida
         """
-        ftp_config = self.config['ftp']
+        ftp_config = self.cfg.ftp
         
         try:
-            self.logger.info(f"Conectando ao servidor FTP: {ftp_config['host']}")
-            ftp = ftplib.FTP()
-            ftp.connect(ftp_config['host'], ftp_config.get('port', 21))
-            ftp.login(ftp_config['username'], ftp_config['password'])
+            self.logger.info(f"Conectando ao servidor FTP: {ftp_config.host}")
+            ftp = TunedFTP() if ftp_config.tune_sockets else ftplib.FTP()
+            ftp.connect(ftp_config.host, ftp_config.port)
+            ftp.login(ftp_config.username, ftp_config.password)
             
-            if ftp_config.get('use_passive', True):
+            if ftp_config.use_passive:
                 ftp.set_pasv(True)
             
+            # Nova conexão começa no diretório inicial do usuário
+            self._cwd = None
+            
             self.logger.info("Conexão FTP estabelecida com sucesso")
             return ftp
             
@@ -131,6 +334,18 @@ class OpenVPNConfigUpdater:
             self.logger.error(f"Erro ao conectar ao servidor FTP: {e}")
             raise
     
+    def _ensure_cwd(self, ftp: ftplib.FTP, remote_path: str):
+        """
+        Entra no diretório remoto, sem repetir o CWD se já estiver nele
+        
+        Args:
+            ftp (ftplib.FTP): Conexão FTP
+            remote_path (str): Caminho remoto
+        """
+        if self._cwd != remote_path:
+            ftp.cwd(remote_path)
+            self._cwd = remote_path
+    
     def _find_latest_ovpn_file(self, ftp: ftplib.FTP, remote_path: str) -> Optional[Dict[str, Any]]:
         """
         Encontra o arquivo .ovpn mais recente no diretório remoto
@@ -143,78 +358,183 @@ class OpenVPNConfigUpdater:
             Optional[Dict[str, Any]]: Informações do arquivo mais recente ou None se não encontrado
         """
         try:
-            ftp.cwd(remote_path)
-            files = []
-            ftp.retrlines('LIST', files.append)
+            self._ensure_cwd(ftp, remote_path)
             
-            ovpn_files = []
+            ovpn_files = None
+            if 'MLST' in self._get_ftp_features(ftp):
+                ovpn_files = self._mlsd_ovpn_files(ftp)
             
-            for file_info in files:
-                # Parse da saída do comando LIST
-                parts = file_info.split()
-                if len(parts) >= 9:
-                    filename = parts[-1]
-                    
-                    # Verificar se é um arquivo .ovpn
-                    if filename.lower().endswith('.ovpn'):
-                        try:
-                            # Extrair tamanho e data de modificação
-                            size = int(parts[4])
-                            date_str = ' '.join(parts[5:8])  # Mês, dia, hora/ano
-                            
-                            # Converter data para timestamp para comparação
-                            try:
-                                # Formato típico: "Dec 15 14:30" ou "Dec 15 2023"
-                                if ':' in date_str:
-                                    # Formato com hora
-                                    date_obj = datetime.strptime(date_str, '%b %d %H:%M')
-                                    # Assumir ano atual se não especificado
-                                    if date_obj.year == 1900:
-                                        date_obj = date_obj.replace(year=datetime.now().year)
-                                else:
-                                    # Formato com ano
-                                    date_obj = datetime.strptime(date_str, '%b %d %Y')
-                                
-                                timestamp = date_obj.timestamp()
-                                
-                                ovpn_files.append({
-                                    'size': size,
-                                    'date_str': date_str,
-                                    'filename': filename,
-                                    'timestamp': timestamp
-                                })
-                                
-                                self.logger.debug(f"Arquivo .ovpn encontrado: {filename} ({size} bytes, {date_str})")
-                                
-                            except ValueError as e:
-                                self.logger.warning(f"Erro ao parsear data do arquivo {filename}: {e}")
-                                continue
-                                
-                        except ValueError as e:
-                            self.logger.warning(f"Erro ao parsear informações do arquivo {filename}: {e}")
-                            continue
+            if ovpn_files is None:
+                ovpn_files = self._list_ovpn_files(ftp)
             
             if not ovpn_files:
-                self.logger.warning(f"Nenhum arquivo .ovpn encontrado em {remote_path}")
+                self.logger.warning("Nenhum arquivo .ovpn encontrado em %s", remote_path)
                 return None
             
             # Ordenar por timestamp (mais recente primeiro)
             ovpn_files.sort(key=lambda x: x['timestamp'], reverse=True)
             
             latest_file = ovpn_files[0]
-            self.logger.info(f"Arquivo .ovpn mais recente encontrado: {latest_file['filename']} "
-                           f"({latest_file['size']} bytes, {latest_file['date_str']})")
+            self.logger.info("Arquivo .ovpn mais recente encontrado: %s (%d bytes, %s)",
+                             latest_file['filename'], latest_file['size'], latest_file['date_str'])
             
             return latest_file
             
         except ftplib.all_errors as e:
-            self.logger.error(f"Erro ao buscar arquivos .ovpn no diretório remoto: {e}")
+            self.logger.error("Erro ao buscar arquivos .ovpn no diretório remoto: %s", e)
+            return None
+    
+    def _list_ovpn_files(self, ftp: ftplib.FTP) -> list:
+        """
+        Lista os arquivos .ovpn do diretório atual a partir da saída do LIST
+        
+        Args:
+            ftp (ftplib.FTP): Conexão FTP (já no diretório remoto)
+            
+        Returns:
+            list: Informações dos arquivos .ovpn encontrados
+        """
+        files = []
+        ftp.retrlines('LIST', files.append)
+        
+        ovpn_files = []
+        
+        for file_info in files:
+            # Parse da saída do comando LIST
+            parts = file_info.split()
+            if len(parts) >= 9:
+                filename = parts[-1]
+                
+                # Verificar se é um arquivo .ovpn
+                if filename.lower().endswith('.ovpn'):
+                    try:
+                        # Extrair tamanho e data de modificação
+                        size = int(parts[4])
+                        date_str = ' '.join(parts[5:8])  # Mês, dia, hora/ano
+                        
+                        # Converter data para timestamp para comparação
+                        try:
+                            # Formato típico: "Dec 15 14:30" ou "Dec 15 2023"
+                            if ':' in date_str:
+                                # Formato com hora
+                                date_obj = datetime.strptime(date_str, '%b %d %H:%M')
+                                # Assumir ano atual se não especificado
+                                if date_obj.year == 1900:
+                                    date_obj = date_obj.replace(year=datetime.now().year)
+                            else:
+                                # Formato com ano
+                                date_obj = datetime.strptime(date_str, '%b %d %Y')
+                            
+                            timestamp = date_obj.timestamp()
+                            
+                            ovpn_files.append({
+                                'size': size,
+                                'date_str': date_str,
+                                'filename': filename,
+                                'timestamp': timestamp
+                            })
+                            
+                            self.logger.debug("Arquivo .ovpn encontrado: %s (%d bytes, %s)", filename, size, date_str)
+                            
+                        except ValueError as e:
+                            self.logger.warning("Erro ao parsear data do arquivo %s: %s", filename, e)
+                            continue
+                            
+                    except ValueError as e:
+                        self.logger.warning("Erro ao parsear informações do arquivo %s: %s", filename, e)
+                        continue
+        
+        return ovpn_files
+    
+    def _mlsd_ovpn_files(self, ftp: ftplib.FTP) -> Optional[list]:
+        """
+        Lista os arquivos .ovpn do diretório atual via MLSD, que já traz
+        tamanho e data de modificação exatos (UTC) em uma única transferência
+        
+        Args:
+            ftp (ftplib.FTP): Conexão FTP (já no diretório remoto)
+            
+        Returns:
+            Optional[list]: Informações dos arquivos .ovpn encontrados ou None
+            se o servidor não aceitar MLSD (usar LIST)
+        """
+        try:
+            entries = list(ftp.mlsd())
+        except ftplib.error_perm as e:
+            self.logger.debug("Servidor FTP não aceitou MLSD, usando LIST: %s", e)
             return None
+        
+        ovpn_files = []
+        
+        for filename, facts in entries:
+            if facts.get('type', 'file').lower() != 'file' or not filename.lower().endswith('.ovpn'):
+                continue
+            
+            try:
+                size = int(facts['size'])
+                mdtm = facts['modify'][:14]
+                date_obj = self._parse_ftp_time(mdtm)
+            except (KeyError, ValueError) as e:
+                self.logger.warning("Erro ao parsear informações do arquivo %s: %s", filename, e)
+                continue
+            
+            ovpn_files.append({
+                'size': size,
+                'mdtm': mdtm,
+                'date_str': date_obj.strftime('%Y-%m-%d %H:%M:%S UTC'),
+                'filename': filename,
+                'timestamp': date_obj.timestamp()
+            })
+            
+            self.logger.debug("Arquivo .ovpn encontrado: %s (%d bytes, %s)", filename, size, mdtm)
+        
+        return ovpn_files
+    
+    def _get_ftp_features(self, ftp: ftplib.FTP) -> set:
+        """
+        Obtém as extensões suportadas pelo servidor FTP (comando FEAT)
+        
+        O resultado é armazenado na instância para evitar nova detecção
+        de capacidades em chamadas subsequentes.
+        
+        Args:
+            ftp (ftplib.FTP): Conexão FTP
+            
+        Returns:
+            set: Nomes das extensões suportadas (ex.: 'MLST', 'MDTM', 'SIZE')
+        """
+        if self._ftp_features is None:
+            features = set()
+            try:
+                resp = ftp.sendcmd('FEAT')
+                for line in resp.splitlines()[1:-1]:
+                    if line.strip():
+                        features.add(line.split()[0].upper())
+            except ftplib.all_errors as e:
+                self.logger.debug("Servidor FTP não suporta FEAT: %s", e)
+            self._ftp_features = features
+        return self._ftp_features
+    
+    @staticmethod
+    def _parse_ftp_time(value: str) -> datetime:
+        """
+        Converte um timestamp FTP (YYYYMMDDHHMMSS[.sss], UTC) para datetime
+        
+        Args:
+            value (str): Timestamp retornado por MDTM ou MLST
+            
+        Returns:
+            datetime: Data de modificação em UTC
+        """
+        return datetime.strptime(value.strip()[:14], '%Y%m%d%H%M%S').replace(tzinfo=timezone.utc)
     
     def _get_remote_file_info(self, ftp: ftplib.FTP, remote_path: str, filename: str) -> Optional[Dict[str, Any]]:
         """
         Obtém informações do arquivo remoto (tamanho, data de modificação)
         
+        Usa MLST quando disponível ou SIZE + MDTM, evitando transferir e
+        parsear a listagem completa do diretório.
+        
         Args:
             ftp (ftplib.FTP): Conexão FTP
             remote_path (str): Caminho remoto
@@ -224,29 +544,48 @@ class OpenVPNConfigUpdater:
             Optional[Dict[str, Any]]: Informações do arquivo ou None se não encontrado
         """
         try:
-            ftp.cwd(remote_path)
-            files = []
-            ftp.retrlines('LIST', files.append)
-            
-            for file_info in files:
-                # Parse da saída do comando LIST
-                parts = file_info.split()
-                if len(parts) >= 9 and parts[-1] == filename:
-                    # Extrair tamanho e data de modificação
-                    size = int(parts[4])
-                    date_str = ' '.join(parts[5:8])  # Mês, dia, hora/ano
-                    
-                    return {
-                        'size': size,
-                        'date_str': date_str,
-                        'filename': filename
-                    }
+            self._ensure_cwd(ftp, remote_path)
             
-            self.logger.warning(f"Arquivo {filename} não encontrado em {remote_path}")
-            return None
+            size = None
+            mdtm = None
+            
+            if 'MLST' in self._get_ftp_features(ftp):
+                # Resposta no formato "250-...\r\n type=file;size=123;modify=20240101120000; nome\r\n250 ..."
+                resp = ftp.sendcmd(f'MLST {filename}')
+                for line in resp.splitlines()[1:-1]:
+                    facts_str = line.strip().split(' ', 1)[0]
+                    facts = dict(fact.split('=', 1) for fact in facts_str.split(';') if '=' in fact)
+                    size = int(facts['size']) if 'size' in facts else None
+                    mdtm = facts.get('modify')
+            
+            if size is None:
+                size = ftp.size(filename)
+            if mdtm is None:
+                resp = ftp.voidcmd(f'MDTM {filename}')
+                mdtm = resp[4:].strip()
+            
+            if size is None:
+                self.logger.warning("Não foi possível obter o tamanho de %s em %s", filename, remote_path)
+                return None
+            
+            date_obj = self._parse_ftp_time(mdtm)
             
+            return {
+                'size': size,
+                'mdtm': mdtm[:14],
+                'date_str': date_obj.strftime('%Y-%m-%d %H:%M:%S UTC'),
+                'filename': filename,
+                'timestamp': date_obj.timestamp()
+            }
+            
+        except ftplib.error_perm as e:
+            self.logger.warning("Arquivo %s não encontrado em %s: %s", filename, remote_path, e)
+            return None
         except ftplib.all_errors as e:
-            self.logger.error(f"Erro ao obter informações do arquivo remoto: {e}")
+            self.logger.error("Erro ao obter informações do arquivo remoto: %s", e)
+            return None
+        except ValueError as e:
+            self.logger.error("Erro ao parsear informações do arquivo remoto %s: %s", filename, e)
             return None
     
     def _get_local_file_info(self, file_path: str) -> Optional[Dict[str, Any]]:
@@ -259,36 +598,241 @@ class OpenVPNConfigUpdater:
         Returns:
             Optional[Dict[str, Any]]: Informações do arquivo ou None se não encontrado
         """
-        if not os.path.exists(file_path):
+        try:
+            stat_info = os.stat(file_path)
+        except FileNotFoundError:
             self.logger.warning(f"Arquivo local não encontrado: {file_path}")
             return None
         
-        stat_info = os.stat(file_path)
         return {
             'size': stat_info.st_size,
             'mtime': stat_info.st_mtime,
+            'mtime_ns': stat_info.st_mtime_ns,
             'filename': os.path.basename(file_path)
         }
     
+    @staticmethod
+    def _remove_if_exists(file_path: str):
+        """
+        Remove o arquivo, ignorando se ele não existir
+        
+        Args:
+            file_path (str): Caminho do arquivo
+        """
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+    
+    def _get_state_file(self, local_file_path: str) -> str:
+        """
+        Retorna o caminho do arquivo de estado associado à configuração local
+        
+        Args:
+            local_file_path (str): Caminho do arquivo de configuração local
+            
+        Returns:
+            str: Caminho do arquivo de estado (JSON)
+        """
+        return f"{local_file_path}.state.json"
+    
+    def _load_state(self, local_file_path: str) -> Dict[str, Any]:
+        """
+        Carrega o estado da última verificação bem-sucedida
+        
+        Args:
+            local_file_path (str): Caminho do arquivo de configuração local
+            
+        Returns:
+            Dict[str, Any]: Estado salvo ou dicionário vazio se indisponível
+        """
+        try:
+            with open(self._get_state_file(local_file_path), 'r', encoding='utf-8') as file:
+                state = json.load(file)
+            return state if isinstance(state, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Erro ao ler arquivo de estado, ignorando: {e}")
+            return {}
+    
+    def _save_state(self, local_file_path: str, remote_info: Dict[str, Any], local_hash: str):
+        """
+        Salva o estado atual (arquivo remoto e local) para evitar downloads
+        de verificação nas próximas execuções
+        
+        Args:
+            local_file_path (str): Caminho do arquivo de configuração local
+            remote_info (Dict[str, Any]): Informações do arquivo remoto
+            local_hash (str): Hash do arquivo local
+        """
+        try:
+            stat_info = os.stat(local_file_path)
+        except OSError as e:
+            self.logger.warning(f"Erro ao salvar arquivo de estado: {e}")
+            return
+        
+        self._state = {
+            'remote_filename': remote_info['filename'],
+            'remote_size': remote_info['size'],
+            'remote_mdtm': remote_info.get('mdtm'),
+            'local_size': stat_info.st_size,
+            'local_mtime_ns': stat_info.st_mtime_ns,
+            'hash_algorithm': HASH_ALGORITHM,
+            'local_hash_cache': self._local_hash_cache_entry(stat_info, local_hash)
+        }
+        self._write_state(local_file_path)
+    
+    def _write_state(self, local_file_path: str):
+        """
+        Grava o estado atual (self._state) no arquivo de estado
+        
+        Args:
+            local_file_path (str): Caminho do arquivo de configuração local
+        """
+        try:
+            with open(self._get_state_file(local_file_path), 'w', encoding='utf-8') as file:
+                json.dump(self._state, file)
+        except OSError as e:
+            self.logger.warning(f"Erro ao salvar arquivo de estado: {e}")
+    
+    @staticmethod
+    def _local_hash_cache_entry(stat_info: os.stat_result, file_hash: str) -> Dict[str, Any]:
+        """
+        Monta a entrada de cache do hash local, indexada pelos metadados do arquivo
+        
+        Args:
+            stat_info (os.stat_result): Resultado de os.stat do arquivo
+            file_hash (str): Hash do arquivo
+            
+        Returns:
+            Dict[str, Any]: Entrada de cache
+        """
+        return {
+            'size': stat_info.st_size,
+            'mtime_ns': stat_info.st_mtime_ns,
+            'ino': stat_info.st_ino,
+            'hash': file_hash,
+            'hash_algorithm': HASH_ALGORITHM
+        }
+    
+    def _cached_local_hash(self, file_path: str, cached: Dict[str, Any]) -> Tuple[str, Optional[Dict[str, Any]]]:
+        """
+        Retorna o hash do arquivo local, reaproveitando o valor salvo no
+        arquivo de estado se tamanho, mtime (ns) e inode não mudaram
+        
+        Não altera self._state nem o arquivo de estado, podendo ser executado
+        em outra thread; cabe ao chamador aplicar a nova entrada de cache.
+        
+        Args:
+            file_path (str): Caminho do arquivo de configuração local
+            cached (Dict[str, Any]): Entrada 'local_hash_cache' do estado salvo
+            
+        Returns:
+            Tuple[str, Optional[Dict[str, Any]]]: Hash do arquivo e a nova
+            entrada de cache (None se o valor salvo foi reaproveitado)
+        """
+        stat_info = os.stat(file_path)
+        
+        if (cached.get('hash_algorithm') == HASH_ALGORITHM and
+                cached.get('size') == stat_info.st_size and
+                cached.get('mtime_ns') == stat_info.st_mtime_ns and
+                cached.get('ino') == stat_info.st_ino):
+            self.logger.debug("Hash local reaproveitado do cache: %s", file_path)
+            return cached['hash'], None
+        
+        file_hash = self._calculate_file_hash(file_path)
+        return file_hash, self._local_hash_cache_entry(stat_info, file_hash)
+    
+    def _is_state_current(self, remote_info: Dict[str, Any], local_info: Dict[str, Any]) -> bool:
+        """
+        Verifica se arquivo remoto e local não mudaram desde a última verificação
+        
+        Args:
+            remote_info (Dict[str, Any]): Informações do arquivo remoto
+            local_info (Dict[str, Any]): Informações do arquivo local
+            
+        Returns:
+            bool: True se o estado salvo corresponde aos arquivos atuais
+        """
+        state = self._state
+        if not state or not remote_info.get('mdtm'):
+            return False
+        
+        return (state.get('hash_algorithm') == HASH_ALGORITHM and
+                state.get('remote_filename') == remote_info['filename'] and
+                state.get('remote_size') == remote_info['size'] and
+                state.get('remote_mdtm') == remote_info['mdtm'] and
+                state.get('local_size') == local_info['size'] and
+                state.get('local_mtime_ns') == local_info['mtime_ns'])
+    
+    @staticmethod
+    def _new_hasher():
+        """
+        Cria um objeto de hash do algoritmo configurado (BLAKE3 ou MD5)
+        
+        Returns:
+            Objeto de hash com métodos update() e hexdigest()
+        """
+        return blake3() if blake3 is not None else hashlib.md5()
+    
     def _calculate_file_hash(self, file_path: str) -> str:
         """
-        Calcula hash MD5 do arquivo para verificação de integridade
+        Calcula hash do arquivo para verificação de integridade
+        
+        Usa BLAKE3 quando o pacote blake3 está instalado, caso contrário MD5.
         
         Args:
             file_path (str): Caminho do arquivo
             
         Returns:
-            str: Hash MD5 do arquivo
+            str: Hash do arquivo (hexadecimal)
         """
-        hash_md5 = hashlib.md5()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+            if blake3 is not None:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return self._new_hasher().hexdigest()
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    return blake3(mapped).hexdigest()
+            
+            # Python 3.11+: leitura e hash feitos em C, sem cópias intermediárias
+            if hasattr(hashlib, "file_digest"):
+                return hashlib.file_digest(f, "md5").hexdigest()
+            
+            hash_md5 = hashlib.md5()
+            buf = bytearray(1 << 20)
+            view = memoryview(buf)
+            while (n := f.readinto(buf)):
+                hash_md5.update(view[:n])
+            return hash_md5.hexdigest()
+    
+    def _remote_hash(self, ftp: ftplib.FTP, remote_path: str, filename: str) -> Optional[str]:
+        """
+        Calcula o hash do arquivo remoto durante o download, sem gravá-lo em disco
+        
+        Args:
+            ftp (ftplib.FTP): Conexão FTP
+            remote_path (str): Caminho remoto
+            filename (str): Nome do arquivo remoto
+            
+        Returns:
+            Optional[str]: Hash do arquivo remoto ou None em caso de erro
+        """
+        try:
+            self._ensure_cwd(ftp, remote_path)
+            
+            hasher = self._new_hasher()
+            ftp.retrbinary(f'RETR {filename}', hasher.update, blocksize=1 << 16)
+            return hasher.hexdigest()
+            
+        except ftplib.all_errors as e:
+            self.logger.error(f"Erro ao calcular hash do arquivo remoto: {e}")
+            return None
     
-    def _download_ovpn_file(self, ftp: ftplib.FTP, remote_path: str, filename: str, local_path: str) -> bool:
+    def _download_ovpn_file(self, ftp: ftplib.FTP, remote_path: str, filename: str, local_path: str) -> Optional[Tuple[int, str]]:
         """
-        Baixa o arquivo .ovpn do servidor FTP
+        Baixa o arquivo .ovpn do servidor FTP, calculando tamanho e hash
+        durante a transferência e sincronizando o arquivo em disco (fsync)
         
         Args:
             ftp (ftplib.FTP): Conexão FTP
@@ -297,30 +841,41 @@ class OpenVPNConfigUpdater:
             local_path (str): Caminho local para salvar
             
         Returns:
-            bool: True se download foi bem-sucedido
+            Optional[Tuple[int, str]]: Tamanho e hash do arquivo baixado ou None em caso de erro
         """
         try:
-            ftp.cwd(remote_path)
+            self._ensure_cwd(ftp, remote_path)
             
             # Criar diretório local se não existir
             os.makedirs(os.path.dirname(local_path), exist_ok=True)
             
             # Baixar arquivo
-            self.logger.info(f"Baixando arquivo .ovpn: {filename}")
+            self.logger.info("Baixando arquivo .ovpn: %s", filename)
+            hasher = self._new_hasher()
+            size = 0
+            
             with open(local_path, 'wb') as local_file:
-                ftp.retrbinary(f'RETR {filename}', local_file.write)
+                def write_chunk(chunk: bytes):
+                    nonlocal size
+                    local_file.write(chunk)
+                    hasher.update(chunk)
+                    size += len(chunk)
+                
+                ftp.retrbinary(f'RETR {filename}', write_chunk, blocksize=1 << 16)
+                local_file.flush()
+                os.fsync(local_file.fileno())
             
-            self.logger.info(f"Arquivo .ovpn baixado com sucesso: {local_path}")
-            return True
+            self.logger.info("Arquivo .ovpn baixado com sucesso: %s", local_path)
+            return size, hasher.hexdigest()
             
         except ftplib.all_errors as e:
-            self.logger.error(f"Erro ao baixar arquivo .ovpn: {e}")
-            return False
+            self.logger.error("Erro ao baixar arquivo .ovpn: %s", e)
+            return None
         except Exception as e:
-            self.logger.error(f"Erro inesperado durante download: {e}")
-            return False
+            self.logger.error("Erro inesperado durante download: %s", e)
+            return None
     
-    def _create_backup(self, file_path: str) -> bool:
+    def _create_backup(self, file_path: str) -> Tuple[bool, Optional[str]]:
         """
         Cria backup do arquivo de configuração atual
         
@@ -328,13 +883,14 @@ class OpenVPNConfigUpdater:
             file_path (str): Caminho do arquivo a ser copiado
             
         Returns:
-            bool: True se backup foi criado com sucesso
+            Tuple[bool, Optional[str]]: Se a operação foi bem-sucedida e o caminho
+            do backup criado (None se o backup não está configurado)
         """
         try:
-            backup_config = self.config['openvpn'].get('backup_path')
+            backup_config = self.cfg.openvpn.backup_path
             if not backup_config:
                 self.logger.info("Backup não configurado, pulando criação de backup")
-                return True
+                return True, None
             
             # Criar diretório de backup se não existir
             os.makedirs(backup_config, exist_ok=True)
@@ -346,85 +902,153 @@ class OpenVPNConfigUpdater:
             
             shutil.copy2(file_path, backup_file)
             self.logger.info(f"Backup criado: {backup_file}")
-            return True
+            return True, backup_file
             
         except Exception as e:
             self.logger.error(f"Erro ao criar backup: {e}")
+            return False, None
+    
+    def _has_vpn_interface(self) -> bool:
+        """
+        Verifica se existe interface de rede tun/tap, lendo /sys/class/net
+        diretamente em vez de executar 'ip link show'
+        
+        Returns:
+            bool: True se alguma interface tun/tap estiver presente
+        """
+        try:
+            return any(name.startswith(('tun', 'tap')) for name in os.listdir('/sys/class/net'))
+        except OSError as e:
+            self.logger.warning(f"Erro ao listar interfaces de rede: {e}")
             return False
     
+    def _has_recent_journal_errors(self, service_name: str) -> bool:
+        """
+        Verifica se o serviço registrou erros no journal no último minuto
+        
+        Usa a API do systemd-python quando disponível (prioridade <= 3:
+        ERR, CRIT, ALERT, EMERG, ou mensagem contendo ERROR/FATAL, pois o
+        que o serviço escreve em stdout/stderr é registrado como info);
+        caso contrário, executa journalctl.
+        
+        Args:
+            service_name (str): Nome do serviço OpenVPN
+            
+        Returns:
+            bool: True se erros recentes foram encontrados
+        """
+        if journal is not None:
+            unit = service_name if service_name.endswith('.service') else f"{service_name}.service"
+            reader = journal.Reader()
+            try:
+                reader.add_match(_SYSTEMD_UNIT=unit)
+                reader.seek_realtime(time.time() - 60)
+                for entry in reader:
+                    if entry.get('PRIORITY', 7) <= 3:
+                        return True
+                    message = str(entry.get('MESSAGE', ''))
+                    if any(marker in message for marker in self._JOURNAL_ERROR_MARKERS):
+                        return True
+                return False
+            finally:
+                reader.close()
+        
+        result = subprocess.run(['journalctl', '-u', service_name, '--since', '1 minute ago', '--no-pager'], 
+                              capture_output=True, text=True, timeout=15)
+        return any(marker in result.stdout for marker in self._JOURNAL_ERROR_MARKERS)
+    
+    def _is_service_active(self, service_name: str) -> Tuple[bool, str]:
+        """
+        Verifica se o serviço OpenVPN está ativo via systemctl
+        
+        Args:
+            service_name (str): Nome do serviço OpenVPN
+            
+        Returns:
+            Tuple[bool, str]: Se o serviço está ativo e o estado informado pelo systemctl
+        """
+        result = subprocess.run(['systemctl', 'is-active', service_name], 
+                              capture_output=True, text=True, timeout=10)
+        state = result.stdout.strip()
+        return result.returncode == 0 and state == 'active', state
+    
+    def _retry_delay(self, attempt: int) -> float:
+        """
+        Calcula a espera antes da próxima tentativa (backoff exponencial, até
+        30 s ou retry_interval, o que for maior)
+        
+        Args:
+            attempt (int): Número da tentativa que acabou de falhar (a partir de 1)
+            
+        Returns:
+            float: Tempo de espera em segundos
+        """
+        retry_interval = self.cfg.rollback.retry_interval
+        return min(max(30, retry_interval), retry_interval * (2 ** (attempt - 1)))
+    
     def _check_openvpn_connectivity(self) -> bool:
         """
         Verifica se o OpenVPN está conectado e funcionando
         
+        Em cada tentativa, o estado do serviço e as interfaces tun/tap são
+        consultados em paralelo; o journal só é lido se nenhuma interface
+        VPN for encontrada.
+        
         Returns:
             bool: True se OpenVPN está conectado
         """
         try:
-            rollback_config = self.config.get('verification', {}).get('rollback', {})
-            max_attempts = rollback_config.get('max_connection_attempts', 3)
-            retry_interval = rollback_config.get('retry_interval', 10)
-            timeout = rollback_config.get('connection_timeout', 30)
+            max_attempts = self.cfg.rollback.max_connection_attempts
+            service_name = self.cfg.verification.openvpn_service_name
             
             self.logger.info("Verificando conectividade OpenVPN...")
             
-            for attempt in range(1, max_attempts + 1):
-                self.logger.info(f"Tentativa {attempt}/{max_attempts} de verificação de conectividade")
-                
-                # Verificar se o serviço está rodando
-                service_name = self.config.get('verification', {}).get('openvpn_service_name', 'openvpn@client')
-                
-                try:
-                    # Verificar status do serviço
-                    result = subprocess.run(['systemctl', 'is-active', service_name], 
-                                          capture_output=True, text=True, timeout=10)
-                    
-                    if result.returncode != 0 or result.stdout.strip() != 'active':
-                        self.logger.warning(f"Serviço OpenVPN não está ativo: {result.stdout.strip()}")
-                        if attempt < max_attempts:
-                            time.sleep(retry_interval)
-                            continue
-                        return False
-                    
-                    # Aguardar um pouco para o OpenVPN estabilizar
-                    time.sleep(5)
-                    
-                    # Verificar se há interface tun/tap ativa
-                    result = subprocess.run(['ip', 'link', 'show'], 
-                                          capture_output=True, text=True, timeout=10)
-                    
-                    if 'tun' in result.stdout or 'tap' in result.stdout:
-                        self.logger.info("Interface VPN detectada - OpenVPN conectado")
-                        return True
+            # Aguardar o OpenVPN estabilizar: logo após o reinício o serviço já
+            # está ativo, mas a interface tun/tap ainda não existe
+            time.sleep(self._SETTLE_DELAY)
+            
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                for attempt in range(1, max_attempts + 1):
+                    self.logger.info("Tentativa %d/%d de verificação de conectividade", attempt, max_attempts)
                     
-                    # Verificar logs do OpenVPN para erros recentes
-                    result = subprocess.run(['journalctl', '-u', service_name, '--since', '1 minute ago', '--no-pager'], 
-                                          capture_output=True, text=True, timeout=15)
+                    try:
+                        service_future = executor.submit(self._is_service_active, service_name)
+                        link_future = executor.submit(self._has_vpn_interface)
+                        
+                        # Verificar status do serviço
+                        active, state = service_future.result()
+                        if not active:
+                            self.logger.warning("Serviço OpenVPN não está ativo: %s", state)
+                        
+                        # Verificar se há interface tun/tap ativa
+                        elif link_future.result():
+                            self.logger.info("Interface VPN detectada - OpenVPN conectado")
+                            return True
+                        
+                        # Verificar logs do OpenVPN para erros recentes
+                        elif self._has_recent_journal_errors(service_name):
+                            self.logger.error("Erros detectados nos logs do OpenVPN")
+                        
+                        else:
+                            # Se chegou até aqui, assumir que está funcionando
+                            self.logger.info("OpenVPN aparenta estar funcionando")
+                            return True
+                        
+                    except subprocess.TimeoutExpired:
+                        self.logger.warning("Timeout na verificação (tentativa %d)", attempt)
+                    except Exception as e:
+                        self.logger.warning("Erro na verificação (tentativa %d): %s", attempt, e)
                     
-                    if 'ERROR' in result.stdout or 'FATAL' in result.stdout:
-                        self.logger.error("Erros detectados nos logs do OpenVPN")
-                        if attempt < max_attempts:
-                            time.sleep(retry_interval)
-                            continue
-                        return False
-                    
-                    # Se chegou até aqui, assumir que está funcionando
-                    self.logger.info("OpenVPN aparenta estar funcionando")
-                    return True
-                    
-                except subprocess.TimeoutExpired:
-                    self.logger.warning(f"Timeout na verificação (tentativa {attempt})")
-                except Exception as e:
-                    self.logger.warning(f"Erro na verificação (tentativa {attempt}): {e}")
-                
-                if attempt < max_attempts:
-                    self.logger.info(f"Aguardando {retry_interval} segundos antes da próxima tentativa...")
-                    time.sleep(retry_interval)
+                    if attempt < max_attempts:
+                        delay = self._retry_delay(attempt)
+                        self.logger.info("Aguardando %s segundos antes da próxima tentativa...", delay)
+                        time.sleep(delay)
             
             self.logger.error("Falha em todas as tentativas de verificação de conectividade")
             return False
             
         except Exception as e:
-            self.logger.error(f"Erro inesperado durante verificação de conectividade: {e}")
+            self.logger.error("Erro inesperado durante verificação de conectividade: %s", e)
             return False
     
     def _rollback_configuration(self, backup_file: str, current_file: str) -> bool:
@@ -446,8 +1070,7 @@ class OpenVPNConfigUpdater:
                 return False
             
             # Remover arquivo atual
-            if os.path.exists(current_file):
-                os.remove(current_file)
+            self._remove_if_exists(current_file)
             
             # Restaurar backup
             shutil.copy2(backup_file, current_file)
@@ -475,11 +1098,11 @@ class OpenVPNConfigUpdater:
             bool: True se serviço foi reiniciado com sucesso
         """
         try:
-            if not self.config.get('verification', {}).get('restart_openvpn', True):
+            if not self.cfg.verification.restart_openvpn:
                 self.logger.info("Reinicialização do OpenVPN desabilitada na configuração")
                 return True
             
-            service_name = self.config.get('verification', {}).get('openvpn_service_name', 'openvpn')
+            service_name = self.cfg.verification.openvpn_service_name
             
             self.logger.info(f"Reiniciando serviço OpenVPN: {service_name}")
             
@@ -517,56 +1140,93 @@ class OpenVPNConfigUpdater:
         Returns:
             bool: True se atualização foi realizada com sucesso ou não necessária
         """
+        executor = ThreadPoolExecutor(max_workers=1)
+        
         try:
-            ovpn_config = self.config['openvpn']
+            ovpn_config = self.cfg.openvpn
+            
+            # Obter informações do arquivo local
+            local_file_path = self._local_file_path
+            local_info = self._get_local_file_info(local_file_path)
+            self._state = self._load_state(local_file_path)
+            
+            # Calcular hash local em paralelo com as operações FTP (limitadas pela latência de rede)
+            local_hash_future = None
+            if local_info:
+                local_hash_future = executor.submit(self._cached_local_hash, local_file_path,
+                                                    self._state.get('local_hash_cache') or {})
             
             # Conectar ao FTP
             ftp = self._connect_ftp()
             
             try:
+                # Entrar no diretório remoto uma única vez para toda a sessão
+                self._ensure_cwd(ftp, ovpn_config.remote_path)
+                
                 # Encontrar o arquivo .ovpn mais recente
-                remote_info = self._find_latest_ovpn_file(ftp, ovpn_config['remote_path'])
+                remote_info = self._find_latest_ovpn_file(ftp, ovpn_config.remote_path)
                 
                 if not remote_info:
                     self.logger.error("Não foi possível encontrar arquivo .ovpn no diretório remoto")
                     return False
                 
-                # Obter informações do arquivo local
-                local_file_path = os.path.join(ovpn_config['local_openvpn_path'], ovpn_config['local_config_filename'])
-                local_info = self._get_local_file_info(local_file_path)
+                # MLSD/LIST usam modo ASCII; SIZE/MDTM e RETR esperam modo binário
+                ftp.voidcmd('TYPE I')
+                
+                # A listagem via LIST não traz tamanho/data exatos: consultar
+                # SIZE/MDTM apenas nesse caso (MLSD já os fornece)
+                if not remote_info.get('mdtm'):
+                    exact_info = self._get_remote_file_info(ftp, ovpn_config.remote_path, remote_info['filename'])
+                    if exact_info:
+                        remote_info = exact_info
                 
                 # Se arquivo local não existe, fazer download
                 if not local_info:
                     self.logger.info("Arquivo de configuração local não encontrado, fazendo download...")
-                    return self._download_and_install_ovpn(ftp, ovpn_config, local_file_path, remote_info['filename'])
+                    return self._download_and_install_ovpn(ftp, ovpn_config, local_file_path, remote_info)
+                
+                strict_hash_verify = self.cfg.verification.strict_hash_verify
+                
+                # Se nada mudou desde a última verificação, evitar download
+                if not strict_hash_verify and self._is_state_current(remote_info, local_info):
+                    self.logger.info("Configuração local está atualizada (cached: unchanged)")
+                    return True
                 
                 # Comparar tamanhos dos arquivos
                 if remote_info['size'] != local_info['size']:
                     self.logger.info(f"Arquivo .ovpn remoto tem tamanho diferente. "
                                    f"Remoto: {remote_info['size']} bytes, "
                                    f"Local: {local_info['size']} bytes")
-                    return self._download_and_install_ovpn(ftp, ovpn_config, local_file_path, remote_info['filename'])
+                    return self._download_and_install_ovpn(ftp, ovpn_config, local_file_path, remote_info)
+                
+                # Mesmo tamanho e mesmo MDTM já verificado: confiar sem baixar novamente
+                if (not strict_hash_verify and remote_info.get('mdtm') and
+                        remote_info['mdtm'] == self._state.get('remote_mdtm') and
+                        remote_info['filename'] == self._state.get('remote_filename')):
+                    self.logger.info("Tamanho e data de modificação remotos inalterados, configuração local está atualizada")
+                    return True
                 
                 # Se tamanhos são iguais, verificar hash para ter certeza
                 self.logger.info("Tamanhos são iguais, verificando integridade...")
                 
-                # Baixar arquivo temporário para comparação
-                temp_file = f"{local_file_path}.temp"
-                if self._download_ovpn_file(ftp, ovpn_config['remote_path'], 
-                                          remote_info['filename'], temp_file):
+                # Calcular hash do arquivo remoto durante a transferência (sem arquivo temporário)
+                remote_hash = self._remote_hash(ftp, ovpn_config.remote_path, remote_info['filename'])
+                if remote_hash:
                     
                     # Comparar hashes
-                    local_hash = self._calculate_file_hash(local_file_path)
-                    remote_hash = self._calculate_file_hash(temp_file)
+                    local_hash, hash_cache_entry = local_hash_future.result()
                     
-                    # Remover arquivo temporário
-                    os.remove(temp_file)
+                    # Estado atualizado apenas nesta thread, depois do cálculo
+                    if hash_cache_entry:
+                        self._state['local_hash_cache'] = hash_cache_entry
+                        self._write_state(local_file_path)
                     
                     if local_hash != remote_hash:
                         self.logger.info("Hashes diferentes detectados, configuração será atualizada")
-                        return self._download_and_install_ovpn(ftp, ovpn_config, local_file_path, remote_info['filename'])
+                        return self._download_and_install_ovpn(ftp, ovpn_config, local_file_path, remote_info)
                     else:
                         self.logger.info("Configuração local está atualizada")
+                        self._save_state(local_file_path, remote_info, local_hash)
                         return True
                 else:
                     self.logger.error("Falha ao baixar arquivo para verificação")
@@ -578,16 +1238,18 @@ class OpenVPNConfigUpdater:
         except Exception as e:
             self.logger.error(f"Erro durante verificação e atualização: {e}")
             return False
+        finally:
+            executor.shutdown(wait=True)
     
-    def _download_and_install_ovpn(self, ftp: ftplib.FTP, ovpn_config: Dict[str, Any], local_file_path: str, remote_filename: str) -> bool:
+    def _download_and_install_ovpn(self, ftp: ftplib.FTP, ovpn_config: OpenVpnCfg, local_file_path: str, remote_info: Dict[str, Any]) -> bool:
         """
         Baixa e instala o novo arquivo .ovpn como configuração
         
         Args:
             ftp (ftplib.FTP): Conexão FTP
-            ovpn_config (Dict[str, Any]): Configurações OpenVPN
+            ovpn_config (OpenVpnCfg): Configurações OpenVPN
             local_file_path (str): Caminho do arquivo local
-            remote_filename (str): Nome do arquivo remoto a ser baixado
+            remote_info (Dict[str, Any]): Informações do arquivo remoto a ser baixado
             
         Returns:
             bool: True se instalação foi bem-sucedida
@@ -595,63 +1257,60 @@ class OpenVPNConfigUpdater:
         try:
             # Criar backup se configurado
             backup_file = None
-            if self.config.get('verification', {}).get('create_backup', True):
+            if self.cfg.verification.create_backup:
                 if os.path.exists(local_file_path):
-                    if not self._create_backup(local_file_path):
+                    # Rollback usa exatamente o backup criado agora
+                    backup_ok, backup_file = self._create_backup(local_file_path)
+                    if not backup_ok:
                         self.logger.warning("Falha ao criar backup, continuando com atualização...")
-                    else:
-                        # Encontrar o arquivo de backup mais recente
-                        backup_config = self.config['openvpn'].get('backup_path')
-                        if backup_config and os.path.exists(backup_config):
-                            backup_files = [f for f in os.listdir(backup_config) 
-                                          if f.startswith(os.path.basename(local_file_path)) and f.endswith('.backup_')]
-                            if backup_files:
-                                # Ordenar por data de modificação (mais recente primeiro)
-                                backup_files.sort(key=lambda x: os.path.getmtime(os.path.join(backup_config, x)), reverse=True)
-                                backup_file = os.path.join(backup_config, backup_files[0])
-                                self.logger.info(f"Backup identificado: {backup_file}")
             
             # Baixar novo arquivo .ovpn
-            temp_file = f"{local_file_path}.new"
-            if not self._download_ovpn_file(ftp, ovpn_config['remote_path'], 
-                                          remote_filename, temp_file):
+            temp_file = self._temp_file_path
+            download = self._download_ovpn_file(ftp, ovpn_config.remote_path, 
+                                                remote_info['filename'], temp_file)
+            if not download:
+                self._remove_if_exists(temp_file)
                 return False
             
-            # Verificar se o arquivo baixado é válido (não está vazio)
-            if os.path.getsize(temp_file) == 0:
+            downloaded_size, downloaded_hash = download
+            
+            # Verificar se o arquivo baixado é válido (não está vazio e tem o tamanho esperado)
+            if downloaded_size == 0:
                 self.logger.error("Arquivo baixado está vazio")
                 os.remove(temp_file)
                 return False
             
-            # Substituir arquivo antigo
-            if os.path.exists(local_file_path):
-                os.remove(local_file_path)
-            
-            shutil.move(temp_file, local_file_path)
+            if downloaded_size != remote_info['size']:
+                self.logger.error(f"Tamanho do arquivo baixado ({downloaded_size} bytes) difere "
+                                  f"do arquivo remoto ({remote_info['size']} bytes)")
+                os.remove(temp_file)
+                return False
             
             # Definir permissões apropriadas (somente leitura para proprietário)
-            os.chmod(local_file_path, 0o600)
+            os.chmod(temp_file, 0o600)
+            
+            # Substituir arquivo antigo de forma atômica (mesmo sistema de arquivos)
+            os.rename(temp_file, local_file_path)
             
             self.logger.info(f"Configuração OpenVPN atualizada com sucesso: {local_file_path}")
             
             # Reiniciar serviço OpenVPN se configurado
             if not self._restart_openvpn_service():
                 self.logger.error("Falha ao reiniciar serviço OpenVPN")
-                if backup_file and self.config.get('verification', {}).get('rollback', {}).get('auto_rollback', True):
+                if backup_file and self.cfg.rollback.auto_rollback:
                     self.logger.warning("Tentando rollback devido à falha no reinício do serviço")
                     return self._rollback_configuration(backup_file, local_file_path)
                 return False
             
             # Verificar conectividade se configurado
-            rollback_config = self.config.get('verification', {}).get('rollback', {})
-            if rollback_config.get('check_connectivity', True):
+            if self.cfg.rollback.check_connectivity:
                 self.logger.info("Verificando conectividade após atualização...")
                 
                 if not self._check_openvpn_connectivity():
                     self.logger.error("Falha na verificação de conectividade")
                     
                     # Fazer rollback se configurado
-                    if rollback_config.get('auto_rollback', True) and backup_file:
+                    if self.cfg.rollback.auto_rollback and backup_file:
                         self.logger.warning("Executando rollback automático devido à falha de conectividade")
                         return self._rollback_configuration(backup_file, local_file_path)
                     else:
@@ -660,14 +1319,13 @@ class OpenVPNConfigUpdater:
                 else:
                     self.logger.info("Verificação de conectividade bem-sucedida")
             
+            self._save_state(local_file_path, remote_info, downloaded_hash)
             return True
             
         except Exception as e:
             self.logger.error(f"Erro durante instalação da configuração: {e}")
             # Remover arquivo temporário se existir
-            temp_file = f"{local_file_path}.new"
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+            self._remove_if_exists(self._temp_file_path)
             return False
 
 
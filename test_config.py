@@ -3,149 +3,324 @@
 Script de teste para validar a configuração do OpenVPN Config Updater
 """
 
+import argparse
+import importlib.util
+import io
 import os
+import stat
 import sys
-import yaml
 from pathlib import Path
 
-def test_config_file(config_file="config.yml"):
+# Seções e chaves obrigatórias do arquivo de configuração
+_REQUIRED_SECTIONS = frozenset(('ftp', 'openvpn'))
+_REQUIRED_FTP_KEYS = frozenset(('host', 'username', 'password'))
+_REQUIRED_OVPN_KEYS = frozenset(('remote_path', 'local_openvpn_path', 'local_config_filename'))
+
+# Modelos das mensagens de configuração verificada
+_TMPL_FTP = "✅ Configuração FTP '{key}': {val}"
+_TMPL_OVPN = "✅ Configuração OpenVPN '{key}': {val}"
+
+# Textos fixos de main(), já codificados em UTF-8
+_BANNER = ("OpenVPN Config Updater - Teste de Configuração\n" + "=" * 50 + "\n").encode('utf-8')
+_SEPARATOR = ("\n" + "=" * 50 + "\n").encode('utf-8')
+_SUMMARY_OK = "✅ Todos os testes passaram! Sistema pronto para uso.\n".encode('utf-8')
+_SUMMARY_FAIL = "❌ Alguns testes falharam. Corrija os problemas antes de usar.\n".encode('utf-8')
+
+# Dependências verificadas por test_dependencies: (módulo, descrição)
+_DEPENDENCIES = (
+    ('yaml', 'PyYAML'),
+    ('ftplib', 'ftplib (built-in)'),
+    ('hashlib', 'hashlib (built-in)'),
+    ('logging', 'logging (built-in)'),
+    ('pathlib', 'pathlib (built-in)'),
+    ('subprocess', 'subprocess (built-in)'),
+    ('socket', 'socket (built-in)'),
+    ('time', 'time (built-in)')
+)
+
+def _noop(*args, **kwargs):
+    """
+    Substituto de print quando a saída está desativada
+    """
+
+def _write_bytes(data):
+    """
+    Escreve bytes já codificados diretamente no buffer da saída padrão
+    
+    Args:
+        data (bytes): Texto codificado em UTF-8
+    """
+    buffer = getattr(sys.stdout, 'buffer', None)
+    if buffer is None:
+        sys.stdout.write(data.decode('utf-8'))
+        return
+    # Esvaziar a camada de texto para preservar a ordem das mensagens
+    sys.stdout.flush()
+    buffer.write(data)
+
+def _probe(path):
+    """
+    Verifica a existência de um caminho com uma única chamada a os.stat
+    
+    Args:
+        path (str | Path): Caminho a verificar
+        
+    Returns:
+        tuple: (existe, é diretório)
+    """
+    try:
+        st = os.stat(path)
+    except (OSError, ValueError):
+        # Mesma semântica de os.path.exists (ex.: sem permissão => não existe)
+        return False, False
+    return True, stat.S_ISDIR(st.st_mode)
+
+# Diretórios de log já encontrados (apenas resultados positivos são memorizados)
+_EXISTING_LOG_DIRS = set()
+
+def _log_dir_exists(log_dir):
+    """
+    Verifica se o diretório de log existe, usando lstat (sem seguir links)
+    e memorizando diretórios já encontrados
+    
+    Args:
+        log_dir (str): Diretório de log
+        
+    Returns:
+        bool: True se o diretório existe
+    """
+    if log_dir in _EXISTING_LOG_DIRS:
+        return True
+    if os.path.lexists(log_dir):
+        _EXISTING_LOG_DIRS.add(log_dir)
+        return True
+    return False
+
+def _load_config(path):
+    """
+    Carrega e parseia o arquivo YAML de configuração
+    
+    Args:
+        path (str): Caminho para o arquivo de configuração
+        
+    Returns:
+        dict: Configuração carregada
+    """
+    # Importado sob demanda: só é necessário quando há configuração para carregar
+    import yaml
+    
+    # Mesmo loader do atualizador (SafeLoader, em C via libyaml quando
+    # disponível), para que a validação reflita o que ele de fato aceita
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    
+    # Leitura binária até o EOF, dimensionada pelo fstat do arquivo aberto
+    # (funciona também com pipes/FIFOs, cujo tamanho é 0); o próprio parser
+    # detecta a codificação (UTF-8/BOM)
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        bufsize = max(os.fstat(fd).st_size + 1, 65536)
+        chunks = []
+        while (chunk := os.read(fd, bufsize)):
+            chunks.append(chunk)
+    finally:
+        os.close(fd)
+    
+    return yaml.load(b''.join(chunks), Loader=loader)
+
+def test_config_file(config_file="config.yml", verbose=True):
     """
     Testa se o arquivo de configuração está válido e completo
     
     Args:
         config_file (str): Caminho para o arquivo de configuração
+        verbose (bool): Se False, nenhuma mensagem é exibida
     """
-    print(f"=== Testando arquivo de configuração: {config_file} ===\n")
+    _p = print if verbose else _noop
     
-    # Verificar se arquivo existe
-    if not os.path.exists(config_file):
-        print(f"❌ ERRO: Arquivo {config_file} não encontrado!")
-        print("   Copie config.example.yml para config.yml e configure as opções.")
-        return False
+    # Mensagens de sucesso são acumuladas e escritas de uma só vez;
+    # mensagens de erro são impressas imediatamente (após o que já foi acumulado)
+    out = io.StringIO()
+    
+    def emit(message):
+        out.write(message)
+        out.write('\n')
+    
+    def flush():
+        sys.stdout.write(out.getvalue())
+        out.seek(0)
+        out.truncate()
+    
+    if not verbose:
+        emit = flush = _noop
+    
+    emit(f"=== Testando arquivo de configuração: {config_file} ===\n")
+    
+    import yaml
     
     try:
-        # Carregar configuração
-        with open(config_file, 'r', encoding='utf-8') as file:
-            config = yaml.safe_load(file)
+        # Carregar configuração (sem verificação prévia de existência)
+        try:
+            config = _load_config(config_file)
+        except FileNotFoundError:
+            flush()
+            _p(f"❌ ERRO: Arquivo {config_file} não encontrado!")
+            _p("   Copie config.example.yml para config.yml e configure as opções.")
+            return False
         
-        print("✅ Arquivo YAML carregado com sucesso")
+        emit("✅ Arquivo YAML carregado com sucesso")
         
         # Verificar seções obrigatórias
-        required_sections = ['ftp', 'openvpn']
-        for section in required_sections:
-            if section not in config:
-                print(f"❌ ERRO: Seção '{section}' não encontrada")
-                return False
-            print(f"✅ Seção '{section}' encontrada")
+        missing = _REQUIRED_SECTIONS - config.keys()
+        if missing:
+            flush()
+            for section in sorted(missing):
+                _p(f"❌ ERRO: Seção '{section}' não encontrada")
+            return False
+        for section in config:
+            if section in _REQUIRED_SECTIONS:
+                emit(f"✅ Seção '{section}' encontrada")
         
         # Verificar configurações FTP
         ftp_config = config['ftp']
-        required_ftp_keys = ['host', 'username', 'password']
-        for key in required_ftp_keys:
-            if key not in ftp_config:
-                print(f"❌ ERRO: Configuração FTP '{key}' não encontrada")
-                return False
-            print(f"✅ Configuração FTP '{key}': {ftp_config[key] if key != 'password' else '***'}")
+        missing = _REQUIRED_FTP_KEYS - ftp_config.keys()
+        if missing:
+            flush()
+            for key in sorted(missing):
+                _p(f"❌ ERRO: Configuração FTP '{key}' não encontrada")
+            return False
+        redacted = {**ftp_config, 'password': '***'}
+        for key in ftp_config:
+            if key in _REQUIRED_FTP_KEYS:
+                emit(_TMPL_FTP.format(key=key, val=redacted[key]))
         
         # Verificar configurações OpenVPN
         ovpn_config = config['openvpn']
-        required_ovpn_keys = ['remote_path', 'local_openvpn_path', 'local_config_filename']
-        for key in required_ovpn_keys:
-            if key not in ovpn_config:
-                print(f"❌ ERRO: Configuração OpenVPN '{key}' não encontrada")
-                return False
-            print(f"✅ Configuração OpenVPN '{key}': {ovpn_config[key]}")
+        missing = _REQUIRED_OVPN_KEYS - ovpn_config.keys()
+        if missing:
+            flush()
+            for key in sorted(missing):
+                _p(f"❌ ERRO: Configuração OpenVPN '{key}' não encontrada")
+            return False
+        for key in ovpn_config:
+            if key in _REQUIRED_OVPN_KEYS:
+                emit(_TMPL_OVPN.format(key=key, val=ovpn_config[key]))
         
         # Verificar se remote_filename foi removido (não é mais necessário)
         if 'remote_filename' in ovpn_config:
-            print("⚠️  AVISO: 'remote_filename' não é mais necessário - o sistema busca automaticamente o arquivo .ovpn mais recente")
+            emit("⚠️  AVISO: 'remote_filename' não é mais necessário - o sistema busca automaticamente o arquivo .ovpn mais recente")
         
         # Verificar diretórios locais
-        local_path = ovpn_config['local_openvpn_path']
-        if os.path.exists(local_path):
-            print(f"✅ Diretório OpenVPN local existe: {local_path}")
+        local_path = Path(ovpn_config['local_openvpn_path'])
+        local_path_exists, local_path_is_dir = _probe(local_path)
+        if local_path_exists:
+            emit(f"✅ Diretório OpenVPN local existe: {local_path}")
         else:
-            print(f"⚠️  AVISO: Diretório OpenVPN local não existe: {local_path}")
+            emit(f"⚠️  AVISO: Diretório OpenVPN local não existe: {local_path}")
         
-        # Verificar arquivo de configuração local
-        local_config_file = os.path.join(local_path, ovpn_config['local_config_filename'])
-        if os.path.exists(local_config_file):
-            print(f"✅ Arquivo de configuração local existe: {local_config_file}")
+        # Verificar arquivo de configuração local (só consulta se o diretório existir)
+        local_config_file = local_path / ovpn_config['local_config_filename']
+        local_config_exists = False
+        if local_path_is_dir:
+            try:
+                # Uma única leitura do diretório em vez de um stat por arquivo;
+                # is_file() segue links, como Path.is_file() no caso alternativo
+                target = ovpn_config['local_config_filename']
+                with os.scandir(local_path) as entries:
+                    local_config_exists = any(entry.name == target and entry.is_file() for entry in entries)
+            except OSError:
+                local_config_exists = local_config_file.is_file()
+        
+        if local_config_exists:
+            emit(f"✅ Arquivo de configuração local existe: {local_config_file}")
         else:
-            print(f"⚠️  AVISO: Arquivo de configuração local não existe: {local_config_file}")
+            emit(f"⚠️  AVISO: Arquivo de configuração local não existe: {local_config_file}")
         
         # Verificar configurações de log
         log_config = config.get('logging', {})
         log_file = log_config.get('log_file', '/var/log/openvpn_config_updater.log')
         log_dir = os.path.dirname(log_file)
         
-        if os.path.exists(log_dir):
-            print(f"✅ Diretório de log existe: {log_dir}")
+        if _log_dir_exists(log_dir):
+            emit(f"✅ Diretório de log existe: {log_dir}")
         else:
-            print(f"⚠️  AVISO: Diretório de log não existe: {log_dir}")
+            emit(f"⚠️  AVISO: Diretório de log não existe: {log_dir}")
         
-        print("\n=== Resumo do Teste ===")
-        print("✅ Configuração básica válida")
-        print("📝 Verifique as configurações acima antes de usar o sistema")
+        emit("\n=== Resumo do Teste ===")
+        emit("✅ Configuração básica válida")
+        emit("📝 Verifique as configurações acima antes de usar o sistema")
         
+        flush()
         return True
         
     except yaml.YAMLError as e:
-        print(f"❌ ERRO: Erro ao processar arquivo YAML: {e}")
+        flush()
+        _p(f"❌ ERRO: Erro ao processar arquivo YAML: {e}")
         return False
     except Exception as e:
-        print(f"❌ ERRO inesperado: {e}")
+        flush()
+        _p(f"❌ ERRO inesperado: {e}")
         return False
 
-def test_dependencies():
+def test_dependencies(verbose=True):
     """
     Testa se as dependências Python estão instaladas
+    
+    Args:
+        verbose (bool): Se False, nenhuma mensagem é exibida
+    
+    Returns:
+        tuple: (todas disponíveis, conjunto de módulos não encontrados)
     """
-    print("\n=== Testando Dependências Python ===\n")
+    _p = print if verbose else _noop
     
-    dependencies = [
-        ('yaml', 'PyYAML'),
-        ('ftplib', 'ftplib (built-in)'),
-        ('hashlib', 'hashlib (built-in)'),
-        ('logging', 'logging (built-in)'),
-        ('pathlib', 'pathlib (built-in)'),
-        ('subprocess', 'subprocess (built-in)'),
-        ('socket', 'socket (built-in)'),
-        ('time', 'time (built-in)')
-    ]
+    _p("\n=== Testando Dependências Python ===\n")
     
-    all_ok = True
+    missing = set()
     
-    for module, package in dependencies:
-        try:
-            __import__(module)
-            print(f"✅ {package} disponível")
-        except ImportError:
-            print(f"❌ ERRO: {package} não encontrado")
-            all_ok = False
+    for module, package in _DEPENDENCIES:
+        # find_spec só localiza o módulo, sem executá-lo
+        if importlib.util.find_spec(module) is not None:
+            _p(f"✅ {package} disponível")
+        else:
+            _p(f"❌ ERRO: {package} não encontrado")
+            missing.add(module)
     
-    return all_ok
+    return not missing, missing
 
 def main():
     """
     Função principal do teste
     """
-    print("OpenVPN Config Updater - Teste de Configuração")
-    print("=" * 50)
+    parser = argparse.ArgumentParser(description="Testa a configuração do OpenVPN Config Updater")
+    parser.add_argument('config_file', nargs='?', default="config.yml",
+                        help="Arquivo de configuração (padrão: config.yml)")
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help="Não exibe mensagens; o resultado é indicado apenas pelo código de saída")
+    args = parser.parse_args()
+    
+    verbose = not args.quiet
+    _p = print if verbose else _noop
+    _w = _write_bytes if verbose else _noop
+    
+    _w(_BANNER)
     
     # Testar dependências
-    deps_ok = test_dependencies()
+    deps_ok, missing_deps = test_dependencies(verbose)
     
-    # Testar arquivo de configuração
-    config_file = sys.argv[1] if len(sys.argv) > 1 else "config.yml"
-    config_ok = test_config_file(config_file)
+    # Testar arquivo de configuração (impossível sem o PyYAML)
+    config_file = args.config_file
+    if 'yaml' in missing_deps:
+        _p(f"\n❌ ERRO: PyYAML não está instalado - teste do arquivo {config_file} ignorado")
+        config_ok = False
+    else:
+        config_ok = test_config_file(config_file, verbose)
     
-    print("\n" + "=" * 50)
+    _w(_SEPARATOR)
     if deps_ok and config_ok:
-        print("✅ Todos os testes passaram! Sistema pronto para uso.")
+        _w(_SUMMARY_OK)
         sys.exit(0)
     else:
-        print("❌ Alguns testes falharam. Corrija os problemas antes de usar.")
+        _w(_SUMMARY_FAIL)
         sys.exit(1)
 
 if __name__ == "__main__":